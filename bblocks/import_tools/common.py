@@ -1,16 +1,42 @@
 from __future__ import annotations
 
+import json
+import os
 import pathlib
+import tempfile
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from typing import Iterator
 
 import pandas as pd
 import requests
 import io
 from zipfile import ZipFile, BadZipFile
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from bblocks.logger import logger
 
+# pandas only accepts the calamine engine from version 2.2
+_PANDAS_VERSION = tuple(int(v) for v in pd.__version__.split(".")[:2])
+
+try:
+    import python_calamine  # noqa: F401
+
+    EXCEL_ENGINE: str = "calamine" if _PANDAS_VERSION >= (2, 2) else "openpyxl"
+except ImportError:
+    EXCEL_ENGINE: str = "openpyxl"
+
+TIMEOUT: tuple[int, int] = (5, 60)  # (connect, read) timeout in seconds
+
+# response headers used to revalidate saved files, and the matching request headers
+VALIDATORS: dict[str, str] = {
+    "ETag": "If-None-Match",
+    "Last-Modified": "If-Modified-Since",
+}
+
 
 @dataclass(repr=False)
 class ImportData(ABC):
@@ -32,7 +58,6 @@ class ImportData(ABC):
         if self._data is None:
             raise RuntimeError("No data or indicators have been loaded")
 
-        df = pd.DataFrame()
         indicators_ = []
 
         if isinstance(indicators, str) and indicators != "all":
@@ -46,15 +71,13 @@ class ImportData(ABC):
                 if _ not in self._data:
                     logger.warning(f"{_} not loaded or is an invalid indicator.")
 
-            indicators_ = [self._data[_] for _ in indicators if _ in list(self._data)]
+            indicators_ = [self._data[_] for _ in indicators if _ in self._data]
 
         if len(indicators_) == 0:
             logger.warning("No indicators were loaded. Returning empty dataframe.")
+            return pd.DataFrame()
 
-        for _ in indicators_:
-            df = pd.concat([df, _], ignore_index=True)
-
-        return df
+        return pd.concat(indicators_, ignore_index=True, sort=False)
 
 
 def append_new_data(
@@ -75,7 +98,43 @@ def append_new_data(
     return data.drop_duplicates(keep="last").reset_index(drop=True)
 
 
-def get_response(url: str) -> requests.Response:
+def create_session(pool_maxsize: int = 32) -> requests.Session:
+    """Create a requests session which reuses connections to the same host
+
+    Requests that fail to connect or return a 429 or 5xx status are retried
+    up to 5 times with exponential backoff.
+
+    Args:
+        pool_maxsize: maximum number of connections kept open per host
+
+    Returns:
+        a requests session
+    """
+
+    retries = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=16, pool_maxsize=pool_maxsize, max_retries=retries
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+SESSION: requests.Session = create_session()
+
+
+def get_response(
+    url: str, session: requests.Session | None = None
+) -> requests.Response:
     """Get the response from a url
 
     This function is used to get the response from a url.
@@ -83,13 +142,14 @@ def get_response(url: str) -> requests.Response:
 
     Args:
         url: url to get the response from
+        session: session used to make the request. Defaults to the shared SESSION
 
     Returns:
         response from the url
     """
 
     try:
-        response = requests.get(url)
+        response = (session or SESSION).get(url, timeout=TIMEOUT)
         response.raise_for_status()
     except requests.exceptions.ConnectionError:
         raise requests.exceptions.ConnectionError("Invalid url")
@@ -97,7 +157,153 @@ def get_response(url: str) -> requests.Response:
     return response
 
 
-def unzip(file: str | io.BytesIO) -> ZipFile:
+@contextmanager
+def conditional_download(
+    url: str,
+    path: pathlib.Path,
+    session: requests.Session | None = None,
+    method: str = "GET",
+    **kwargs,
+) -> Iterator[pathlib.Path]:
+    """Download a file to disk, reusing the saved copy if it has not changed
+
+    The file is streamed to disk in chunks, so it is never held in memory in full.
+    If the response has an ETag or Last-Modified header, the file is kept and the
+    headers are sent back on the next request. If the server answers 304 (Not
+    Modified), the saved file is used instead of downloading it again. Files which
+    cannot be revalidated are deleted once the context is exited.
+
+    Args:
+        url: url of the file to download
+        path: path where the file is saved
+        session: session used to make the request. Defaults to the shared SESSION
+        method: HTTP method used for the request
+        **kwargs: additional arguments passed to the request, e.g. form data
+
+    Yields:
+        path to the downloaded file
+    """
+
+    validators_path = path.with_suffix(".validators.json")
+
+    # conditional request headers built from the validators of the saved file
+    headers = {}
+    if path.exists() and validators_path.exists():
+        headers = json.loads(validators_path.read_text())
+
+    with (session or SESSION).request(
+        method, url, headers=headers, timeout=TIMEOUT, stream=True, **kwargs
+    ) as response:
+        response.raise_for_status()
+
+        if response.status_code == 304:
+            logger.debug(f"File not modified, using copy saved on disk: {url}")
+            yield path
+            return
+
+        # write to a temporary file first so an interrupted download is not reused
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(dir=path.parent, delete=False)
+        try:
+            with file:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    file.write(chunk)
+            os.replace(file.name, path)
+        except BaseException:
+            # do not leave a partial download behind if the stream fails
+            pathlib.Path(file.name).unlink(missing_ok=True)
+            raise
+
+        validators = {
+            request_header: response.headers[header]
+            for header, request_header in VALIDATORS.items()
+            if header in response.headers
+        }
+
+    validators_path.unlink(missing_ok=True)
+    if validators:
+        validators_path.write_text(json.dumps(validators))
+        yield path
+        return
+
+    try:
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def save_parquet(df: pd.DataFrame, path: pathlib.Path) -> None:
+    """Save a dataframe to path as a zstd compressed parquet file
+
+    The folder is created if it does not exist.
+
+    Args:
+        df: dataframe to save
+        path: path of the parquet file
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, compression="zstd", index=False)
+
+
+def convert_legacy_file(
+    path: pathlib.Path, legacy_suffix: str, **kwargs
+) -> pd.DataFrame | None:
+    """Convert data saved by previous versions of bblocks to parquet
+
+    The legacy file is read and saved as parquet at path. The legacy file is left in
+    place, so it can still be read by older versions. Nothing is done if data is
+    already saved at path.
+
+    Args:
+        path: path of the parquet file
+        legacy_suffix: suffix of the legacy file. Either ".csv" or ".feather"
+        **kwargs: additional arguments passed to the function reading the legacy file
+
+    Returns:
+        The converted dataframe if a legacy file was found, None otherwise
+    """
+
+    if path.exists():
+        return None
+
+    legacy_path = path.with_suffix(legacy_suffix)
+    read = pd.read_csv if legacy_suffix == ".csv" else pd.read_feather
+
+    try:
+        df = read(legacy_path, **kwargs)
+    except FileNotFoundError:
+        return None
+
+    save_parquet(df, path)
+
+    return df
+
+
+def load_parquet(
+    path: pathlib.Path, legacy_suffix: str, **kwargs
+) -> pd.DataFrame | None:
+    """Read the parquet file saved at path
+
+    If there is no parquet file, a legacy file is converted with
+    `convert_legacy_file`.
+
+    Args:
+        path: path of the parquet file
+        legacy_suffix: suffix of the legacy file. Either ".csv" or ".feather"
+        **kwargs: additional arguments passed to the function reading the legacy file
+
+    Returns:
+        The saved dataframe, or None if no data is saved
+    """
+
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        return convert_legacy_file(path, legacy_suffix, **kwargs)
+
+
+def unzip(file: str | pathlib.Path | io.BytesIO) -> ZipFile:
     """Unzip a file
 
     Create a ZipFile object from a file on disk or a file-like object from a requests
@@ -2,15 +2,28 @@
 
 import xml.etree.ElementTree as ET
 from zipfile import ZipFile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import pandas as pd
 from datetime import datetime
-from bs4 import BeautifulSoup
-import io
+from itertools import repeat
+import hashlib
+import html
+import re
+from pathlib import Path
+from typing import Iterator
 import requests
 import numpy as np
 
-from bblocks.import_tools.common import ImportData, get_response, unzip
+from bblocks.import_tools.common import (
+    ImportData,
+    conditional_download,
+    convert_legacy_file,
+    get_response,
+    save_parquet,
+    unzip,
+)
 from bblocks.config import BBPaths
 from bblocks.logger import logger
 from bblocks.cleaning_tools import clean
@@ -26,6 +39,14 @@ COLUMN_MAPPER = {
     "SCALE": "IMF.CL_WEO_SCALE.1.0",
 }
 
+XSD_NAMESPACE = "{http://www.w3.org/2001/XMLSchema}"
+
+# link to the SDMX data file on the download page
+SDMX_LINK_PATTERN = re.compile(
+    r"""<a\b[^>]*?\bhref\s*=\s*["'](?P<href>[^"']*)["'][^>]*>\s*SDMX Data\s*</a>""",
+    re.IGNORECASE,
+)
+
 
 def _smdx_query_url(version: tuple[int, int]) -> str:
     """Generate the url for the SDMX query"""
@@ -45,25 +66,57 @@ def _smdx_query_url(version: tuple[int, int]) -> str:
 
 def _parse_sdmx_query_response(content: requests.Response.content) -> str:
     """Parse the response from the SDMX query"""
-    soup = BeautifulSoup(content, "html.parser")
+
+    if isinstance(content, bytes):
+        content = content.decode(errors="replace")
 
     # check is data exists
-    if soup.find("a", string="SDMX Data"):
-        return soup.find_all("a", string="SDMX Data")[0].get("href")
+    match = SDMX_LINK_PATTERN.search(content)
+    if match:
+        return html.unescape(match.group("href"))
 
 
-def get_sdmx_href(version: tuple[int, int]) -> str | None:
+def get_sdmx_href(
+    version: tuple[int, int], session: requests.Session | None = None
+) -> str | None:
     """retrieve the href for the SDMX file
 
     Args:
         version (tuple[int, int]): the version of the WEO data as a tuple of (year, version)
+        session: session used to make the request. Defaults to the shared session
     """
 
     url = _smdx_query_url(version)
-    response = get_response(url)
+    response = get_response(url, session)
     return _parse_sdmx_query_response(response.content)
 
 
+@contextmanager
+def download_file(url: str, session: requests.Session | None = None) -> Iterator[Path]:
+    """Download a file to disk, reusing the saved copy if it has not changed
+
+    Only the file for the most recently downloaded url is kept on disk.
+
+    Args:
+        url: url of the file to download
+        session: session used to make the request. Defaults to the shared session
+
+    Yields:
+        path to the downloaded file
+    """
+
+    key = hashlib.md5(url.encode()).hexdigest()
+    folder = BBPaths.raw_data / "weo_responses"
+
+    with conditional_download(url, folder / f"{key}.zip", session) as path:
+        # remove the files downloaded for other releases
+        for file in folder.iterdir():
+            if not file.name.startswith(key):
+                file.unlink(missing_ok=True)
+
+        yield path
+
+
 class Parser:
     """Helper class to parse WEO data
 
@@ -80,14 +133,17 @@ class Parser:
         self.data_file: ET = None
         self.schema_file: ET = None
         self.data: pd.DataFrame | None = None
+        self._code_maps: dict[str, dict[str, str]] | None = None
 
     def get_files(self) -> None:
         """Get the root of files"""
 
-        if len(self.folder.namelist()) > 2:
+        names = self.folder.namelist()
+
+        if len(names) > 2:
             raise ValueError("More than two files in zip file")
 
-        for file in self.folder.namelist():
+        for file in names:
             if file.endswith(".xml"):
                 self.data_file = ET.parse(self.folder.open(file)).getroot()
 
@@ -100,42 +156,86 @@ class Parser:
     def _extract_data(self) -> None:
         """extract data from data file"""
 
-        rows = []
-        for series in self.data_file[1]:
-            for obs in series:
-                rows.append({**series.attrib, **obs.attrib})
+        dataset = self.data_file[1]
 
-        self.data = pd.DataFrame(rows)
+        # fixed column schema, in order of first appearance of each attribute
+        series_cols = list(
+            dict.fromkeys(k for series in dataset for k in series.attrib)
+        )
+        obs_cols = list(
+            dict.fromkeys(k for series in dataset for obs in series for k in obs.attrib)
+        )
+
+        # build one list per column. Series attributes are read once per series
+        # and repeated for each of its observations
+        columns = {col: [] for col in series_cols + obs_cols}
+        for series in dataset:
+            n_obs = len(series)
+            for col in series_cols:
+                columns[col].extend(repeat(series.get(col), n_obs))
+            for col in obs_cols:
+                columns[col].extend(obs.get(col) for obs in series)
+
+        self.data = pd.DataFrame(columns)
+
+    @property
+    def code_maps(self) -> dict[str, dict[str, str]]:
+        """Mapping of codes to values for every code list in the schema file.
+        The schema is only searched the first time this is accessed"""
+
+        if self._code_maps is None:
+            self._code_maps = {
+                simple_type.attrib["name"]: {
+                    elem.attrib["value"]: elem[0][0].text
+                    for elem in simple_type.findall("./*/*")
+                }
+                for simple_type in self.schema_file.findall(
+                    f"./{XSD_NAMESPACE}simpleType"
+                )
+            }
+
+        return self._code_maps
 
     def _convert_series_codes(self, series: pd.Series, lookup_value: str) -> pd.Series:
-        """Converts a series of codes to the corresponding values in the schema file"""
+        """Converts a series of codes to the corresponding values in the schema file
+
+        Only the distinct codes are looked up. The result is a categorical series
+        """
 
-        xpath_expr = f"./{{http://www.w3.org/2001/XMLSchema}}simpleType[@name='{lookup_value}']/*/*"
-        query = self.schema_file.findall(xpath_expr)
+        codes = series.astype("category")
+        values = codes.cat.categories.map(self.code_maps.get(lookup_value, {}))
+        categories = pd.Index(values.dropna().unique())
 
-        lookup_dict = {}
-        for elem in query:
-            lookup_dict[elem.attrib["value"]] = elem[0][0].text
+        # position of each code's value in the new categories. The trailing -1 keeps
+        # missing codes (-1) missing after the lookup
+        positions = np.append(categories.get_indexer(values), -1)
 
-        return series.map(lookup_dict)
+        return pd.Series(
+            pd.Categorical.from_codes(positions[codes.cat.codes], categories),
+            index=series.index,
+            name=series.name,
+        )
 
     def _clean_data(self) -> None:
         """Clean and format the dataframe"""
 
+        self.data = self.data.rename(
+            columns={col: f"{col}_CODE" for col in COLUMN_MAPPER}
+        )
         for col, value in COLUMN_MAPPER.items():
-            self.data = self.data.rename(columns={col: f"{col}_CODE"})
             self.data[col] = self._convert_series_codes(self.data[f"{col}_CODE"], value)
 
-        self.data = clean.clean_numeric_series(self.data, series_columns="OBS_VALUE")
-        self.data = clean.clean_numeric_series(
-            self.data,
-            series_columns=[
-                "REF_AREA_CODE",
-                "LASTACTUALDATE",
-                "TIME_PERIOD",
-            ],
-            to=int,
-        )
+        # numeric columns are converted in place, using the smallest integer type
+        self.data["OBS_VALUE"] = clean.clean_number(self.data["OBS_VALUE"])
+        for col in ["REF_AREA_CODE", "LASTACTUALDATE", "TIME_PERIOD"]:
+            self.data[col] = pd.to_numeric(
+                clean.clean_number(self.data[col], to=int), downcast="integer"
+            )
+
+        # the remaining code columns have few distinct values
+        for col in ["UNIT_CODE", "CONCEPT_CODE", "FREQ_CODE", "SCALE_CODE"]:
+            if col in self.data.columns:
+                self.data[col] = self.data[col].astype("category")
 
         self.data.columns = self.data.columns.str.lower()
 
@@ -195,22 +295,57 @@ def roll_back_version(version: tuple[int, int]) -> tuple[int, int]:
         )
 
 
-def extract_data(version) -> pd.DataFrame | None:
+def find_latest_version(
+    session: requests.Session | None = None, n_versions: int = 2
+) -> tuple[tuple[int, int], str]:
+    """Find the most recent version for which SDMX data is available
+
+    The expected latest version and the versions before it are checked in parallel.
+
+    Args:
+        session: session used to make the requests. Defaults to the shared session
+        n_versions: number of versions to check, starting from the expected latest
+
+    Returns:
+        a tuple of the version and the href for its SDMX file
+    """
+
+    versions = [gen_latest_version()]
+    for _ in range(n_versions - 1):
+        versions.append(roll_back_version(versions[-1]))
+
+    with ThreadPoolExecutor(max_workers=n_versions) as executor:
+        hrefs = list(executor.map(lambda v: get_sdmx_href(v, session), versions))
+
+    for version, href in zip(versions, hrefs):
+        if href is not None:
+            return version, href
+
+        logger.debug(f"Data not available for version {version}")
+
+    raise ValueError(f"No data found for versions {versions}")
+
+
+def extract_data(
+    version, session: requests.Session | None = None, href: str | None = None
+) -> pd.DataFrame | None:
     """Downloads latest data or data for specified version
 
     Args:
         version (tuple[int, int]): version to download
+        session: session used to make the requests. Defaults to the shared session
+        href: href for the SDMX file, if already known. Otherwise it is looked up
     """
 
     logger.info(f"Extracting data for version {version}")
 
-    href = get_sdmx_href(version)
+    if href is None:
+        href = get_sdmx_href(version, session)
 
     # if href is not None, get and parse data and save to disk
     if href is not None:
-        response = get_response(BASE_URL + href)
-        folder = unzip(io.BytesIO(response.content))
-        return Parser(folder).get_data()
+        with download_file(BASE_URL + href, session) as path, unzip(path) as folder:
+            return Parser(folder).get_data()
 
     # if href is None, log that no data was found
     else:
@@ -229,9 +364,12 @@ class WEO(ImportData):
 
     Attributes:
         version: tuple of (year, release) or "latest". Default is "latest"
+        session: requests session used to download data. Default is None, which
+            uses a shared session that retries failed requests.
     """
 
     version: str | tuple[int, int] = "latest"
+    session: requests.Session | None = None
 
     def __post_init__(self):
         """check that version is valid"""
@@ -244,40 +382,35 @@ class WEO(ImportData):
     @property
     def _path(self):
         """Generate path based on version"""
-        return BBPaths.raw_data / f"weo_{self.version[0]}_{self.version[1]}.feather"
+        return BBPaths.raw_data / f"weo_{self.version[0]}_{self.version[1]}.parquet"
 
     def _download_data(self) -> None:
         """Downloads latest data or data for specified version if not already available in disk
 
-        If version is "latest" it will generate the expected version based on the current date
-        and try download the data. If it is not available for the expected version, it will
-        roll back the version and try again. If no data is found, it will raise an error.
+        If version is "latest" it will generate the expected version based on the current date.
+        If that version is not available on disk, the expected version and the previous
+        version are checked for data in parallel and the most recent one is downloaded.
+        If no data is found, it will raise an error.
 
         If version is a tuple of (year, release), it will try download the data for that version
         """
 
+        href = None
+
         if self.version == "latest":
             # set version to expected latest version
             self.version = gen_latest_version()
-            # if the path does not exist yet, try download the data
-            if not self._path.exists():
-                df = extract_data(self.version)
-
-                # if data is not None, save to disk
-                if df is not None:
-                    df.to_feather(self._path)
-                    logger.info(f"Data downloaded to disk for version {self.version}")
-                else:
-                    self.version = roll_back_version(self.version)
-                    logger.debug(
-                        f"Data not available for expected version. "
-                        f"Rolling back version to {self.version}"
-                    )
+            # if no data is saved for it, find the latest version with data
+            saved = [self._path, self._path.with_suffix(".feather")]
+            if not any(path.exists() for path in saved):
+                self.version, href = find_latest_version(self.session)
 
+        convert_legacy_file(self._path, ".feather")
         if not self._path.exists():
-            df = extract_data(self.version)
+            df = extract_data(self.version, self.session, href)
             if df is not None:
-                df.to_feather(self._path)
+                save_parquet(df, self._path)
+                self._raw_data = df
                 logger.info(f"Data downloaded to disk for version {self.version}")
             else:
                 raise ValueError(f"No data found for version {self.version}")
@@ -302,7 +435,7 @@ class WEO(ImportData):
 
         # check if raw data is not loaded to object
         if self._raw_data is None:
-            self._raw_data = pd.read_feather(self._path)
+            self._raw_data = pd.read_parquet(self._path)
 
         # load indicators
         if indicators == "all":
@@ -333,36 +466,23 @@ class WEO(ImportData):
         Returns:
             same object with updated data to allow chaining
         """
-        if self.version == "latest":
-            # set version to expected latest version
-            self.version = gen_latest_version()
-            # try download the data
-            df = extract_data(self.version)
-            # if data is not None, save to disk, otherwise roll back version
-            if df is not None:
-                df.to_feather(self._path)
-                logger.info(f"Data downloaded to disk for version {self.version}")
+        href = None
 
-                return self
-
-            else:
-                self.version = roll_back_version(self.version)
-                logger.info(
-                    f"Data not available for expected version. "
-                    f"Rolling back version to {self.version}"
-                )
+        if self.version == "latest":
+            # find the latest version with data, checking versions in parallel
+            self.version, href = find_latest_version(self.session)
 
-        # exctract data for a specific version or if version was rolled back
-        df = extract_data(self.version)
+        # exctract data for a specific version or the latest available version
+        df = extract_data(self.version, self.session, href)
         # if data is not None, save to disk otherwise raise error
         if df is not None:
-            df.to_feather(self._path)
+            save_parquet(df, self._path)
             logger.info(f"Data downloaded to disk for version {self.version}")
         else:
             raise ValueError(f"No data found for version {self.version}")
 
         # load raw data to object
-        self._raw_data = pd.read_feather(self._path)
+        self._raw_data = df
 
         # reload data if reload_data is True
         if reload_data:
@@ -376,7 +496,10 @@ class WEO(ImportData):
 
         if self._raw_data is None:
             self._download_data()
-            self._raw_data = pd.read_feather(self._path)
+
+        # the data is only read from disk if it was not just downloaded
+        if self._raw_data is None:
+            self._raw_data = pd.read_parquet(self._path)
 
         return (
             self._raw_data.loc[:, ["concept_code", "concept"]]
@@ -1,28 +1,108 @@
 """Tools to retrieve data from UNAIDS"""
 
+import hashlib
 import json
-import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 import requests
 
-from bblocks import config
 from bblocks.config import BBPaths
-from bblocks.import_tools.common import ImportData
+from bblocks.import_tools.common import (
+    ImportData,
+    conditional_download,
+    create_session,
+    load_parquet,
+    save_parquet,
+)
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 URL: str = "https://aidsinfo.unaids.org/datasheetdatarequest"
 AREA_CODES: dict = {
     "country": {"name": "world", "code": 2},
     "region": {"name": "world-continents", "code": 1},
 }
-AVAILABLE_INDICATORS = pd.read_json(f"{BBPaths.import_settings}/aids_indicators.json")
+AREA_GROUPINGS: frozenset = frozenset([*AREA_CODES, "all"])
+MAX_WORKERS: int = 8
+DTYPES: dict = {
+    "area_name": "category",
+    "area_id": "category",
+    "year": int,
+    "indicator": "category",
+    "dimension": "category",
+}
+
+# shared session so that connections to UNAIDS are kept alive between requests
+_SESSION = create_session(pool_maxsize=MAX_WORKERS)
+
+
+@lru_cache(maxsize=None)
+def get_available_indicators() -> pd.DataFrame:
+    """Returns a dataframe of available indicators, read from disk on first use"""
+
+    path = BBPaths.import_settings / "aids_indicators.json"
+    return pd.DataFrame(_json_loads(path.read_bytes()))
+
+
+@lru_cache(maxsize=None)
+def get_indicator_categories() -> dict[str, str]:
+    """Returns a dictionary mapping each available indicator to its category"""
+
+    return (
+        get_available_indicators()
+        .drop_duplicates("indicator")
+        .set_index("indicator")["category"]
+        .to_dict()
+    )
+
+
+def __getattr__(name: str):
+    """Load the indicator tables only when they are first accessed"""
+
+    if name == "AVAILABLE_INDICATORS":
+        return get_available_indicators()
+
+    if name == "INDICATOR_CATEGORIES":
+        return get_indicator_categories()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _response_cache_path(request_data: dict) -> Path:
+    """Returns the path where the response to a request is cached"""
+
+    key = hashlib.md5(json.dumps(request_data, sort_keys=True).encode()).hexdigest()
+    return BBPaths.raw_data / "aids_responses" / f"{key}.json"
 
 
 def get_response(
-    url: str, indicator: str, category: str, area_name: str, area_code: str
+    url: str,
+    indicator: str,
+    category: str,
+    area_name: str,
+    area_code: str,
+    session: Optional[requests.Session] = None,
 ) -> dict:
-    """returns a json response from UNAIDS"""
+    """returns a json response from UNAIDS
+
+    Responses with an ETag or Last-Modified header are saved on disk and the
+    headers are sent back on the next identical request. If UNAIDS answers
+    304 (Not Modified), the saved response is reused. Requests are made with the
+    shared module session unless a session is passed.
+    """
 
     request_data = {
         "reqObj[Group_Name]": category,
@@ -32,64 +112,85 @@ def get_response(
     }
 
     try:
-        response = requests.post(url, data=request_data)
-
-        return json.loads(response.content)
-
-    except ConnectionError:
+        with conditional_download(
+            url,
+            _response_cache_path(request_data),
+            session or _SESSION,
+            method="POST",
+            data=request_data,
+        ) as path:
+            return _json_loads(path.read_bytes())
+
+    except (ConnectionError, requests.exceptions.ConnectionError):
         raise ConnectionError(f"Could not extract data for indicator: {indicator}")
 
 
 def parse_data_table(response: dict, dimensions: list, years: list) -> pd.DataFrame:
     """parses data table in json response and returns a formatted dataframe"""
 
-    records = []
+    rows = response["tableData"]
 
-    for row in response["tableData"]:
-        area_name = row["Area_Name"]  # collect area name
-        area_id = row["Area_ID"]  # collect area id
+    # number of observations (years) for each area
+    n_obs = [len(row["Data_Val"]) for row in rows]
 
-        for i, values in enumerate(row["Data_Val"]):
-            values_dict = {d: v for d, v in zip(dimensions, values[0])}
-            values_dict.update(
-                {"area_name": area_name, "area_id": area_id, "year": years[i]}
-            )
+    # fill a preallocated array directly from the response, without intermediate lists
+    values = np.fromiter(
+        chain.from_iterable(values[0] for row in rows for values in row["Data_Val"]),
+        dtype=object,
+        count=sum(n_obs) * len(dimensions),
+    ).reshape(-1, len(dimensions))
 
-            records.append(values_dict)
+    df = pd.DataFrame(values, columns=dimensions).infer_objects()
+    df["area_name"] = np.repeat([row["Area_Name"] for row in rows], n_obs)
+    df["area_id"] = np.repeat([row["Area_ID"] for row in rows], n_obs)
+    df["year"] = [year for n in n_obs for year in years[:n]]
 
-    return pd.DataFrame.from_records(records)
+    return df
 
 
 def parse_global_data(response: dict, dimensions: list, years: list) -> pd.DataFrame:
     """parses global data in json response and returns a formatted dataframe"""
 
-    global_data = [i[0] for i in response["Global_Numbers"][0]["Data_Val"]]
-    return pd.DataFrame.from_records(global_data, columns=dimensions).assign(
-        area_name="Global", area_id="03M49WLD", year=years
+    global_data = np.asarray(
+        [i[0] for i in response["Global_Numbers"][0]["Data_Val"]], dtype=object
     )
 
+    df = pd.DataFrame(global_data, columns=dimensions).apply(
+        pd.to_numeric, errors="coerce"
+    )
+    df["area_name"] = "Global"
+    df["area_id"] = "03M49WLD"
+    df["year"] = years
+
+    return df
+
 
 def clean_data(df: pd.DataFrame, indicator: str) -> pd.DataFrame:
     """cleans dataframe and returns a formatted dataframe"""
 
-    return (
-        df.assign(indicator=indicator)
-        .dropna(how="all", axis=1)
-        .melt(
-            id_vars=["area_name", "area_id", "year", "indicator"],
-            var_name="dimension",
-            value_name="value",
-        )
-        .assign(value=lambda d: pd.to_numeric(d.value, errors="coerce"))
+    id_vars = ["area_name", "area_id", "year", "indicator"]
+
+    df = df.assign(indicator=indicator).dropna(how="all", axis=1)
+    dimensions = [col for col in df.columns if col not in id_vars]
+
+    # coerce the values block to numbers once, then reshape it to long format
+    values = (
+        df[dimensions].apply(pd.to_numeric, errors="coerce").to_numpy(dtype="float64")
+    )
+
+    return pd.DataFrame(
+        {
+            **{col: np.tile(df[col].to_numpy(), len(dimensions)) for col in id_vars},
+            "dimension": np.repeat(dimensions, len(df)).astype(object),
+            "value": values.ravel(order="F"),
+        }
     )
 
 
 def get_category(indicator: str) -> str:
     """returns the category for an indicator"""
 
-    return AVAILABLE_INDICATORS.loc[
-        AVAILABLE_INDICATORS.indicator == indicator, "category"
-    ].unique()[0]
+    return get_indicator_categories()[indicator]
 
 
 def check_response(response: dict) -> None:
@@ -108,15 +209,22 @@ def get_years(response: dict) -> list:
     return response["tableYear"]
 
 
+@lru_cache(maxsize=None)
 def response_params(group: str, indicator: str):
-    """Returns a list of parameters to be used in the response"""
+    """Returns a list of parameters to be used in the response
+
+    The parameters only depend on the grouping and indicator, so they are computed
+    once per combination and reused. The returned dictionary should not be modified.
+    """
+
+    area = AREA_CODES[group]
 
     return {
         "url": URL,
         "indicator": indicator,
         "category": get_category(indicator),
-        "area_name": AREA_CODES[group]["name"],
-        "area_code": AREA_CODES[group]["code"],
+        "area_name": area["name"],
+        "area_code": area["code"],
     }
 
 
@@ -126,49 +234,85 @@ def response_to_df(grouping: str, response: dict, indicator: str) -> pd.DataFram
     dimensions = get_dimensions(response)
     years = get_years(response)
 
+    # each part is cleaned separately, so dimensions missing from only one of them
+    # are dropped from that part alone
     df = parse_data_table(response, dimensions, years).pipe(clean_data, indicator)
     if grouping == "region":
         df_global = parse_global_data(response, dimensions, years).pipe(
             clean_data, indicator
         )
-        return pd.concat([df, df_global])
+        df = pd.concat([df, df_global], ignore_index=True)
 
-    return df
+    return df.astype(DTYPES)
 
 
-def extract_data(indicator: str, grouping: str):
+def extract_data(
+    indicator: str, grouping: str, session: Optional[requests.Session] = None
+):
     """pipeline to extract data"""
 
     params = response_params(grouping, indicator)
-    response = get_response(**params)
+    response = get_response(**params, session=session)
     check_response(response)
     return response_to_df(grouping, response, indicator)
 
 
-def check_if_not_downloaded(indicator: str, area_grouping: str) -> bool:
-    """Checks if data is already downloaded for an indicator and area grouping
+def extract_data_concurrently(
+    pairs: list[tuple[str, str]], session: Optional[requests.Session] = None
+) -> dict[tuple[str, str], pd.DataFrame]:
+    """Extract data for several (indicator, grouping) pairs in parallel
 
     Returns:
-        True if data is not downloaded, False if data is downloaded
+        A dictionary mapping each (indicator, grouping) pair to its dataframe
+    """
+    if len(pairs) == 0:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(len(pairs), MAX_WORKERS)) as executor:
+        return dict(
+            zip(pairs, executor.map(lambda p: extract_data(*p, session=session), pairs))
+        )
+
+
+def _cache_path(indicator: str, area_grouping: str) -> Path:
+    """Returns the path where the data for an indicator and area grouping is saved"""
 
+    return BBPaths.raw_data / f"aids_{area_grouping}_{indicator}.parquet"
+
+
+def check_if_fresh(indicator: str, area_grouping: str, max_age: float | None) -> bool:
+    """Checks if data saved on disk for an indicator and area grouping is recent
+
+    Args:
+        max_age: maximum age of the saved data, in days. If None, data is never
+            considered fresh.
+
+    Returns:
+        True if data was saved less than max_age days ago, False otherwise
     """
-    return not os.path.exists(
-        f"{BBPaths.imported_data}/aids_{area_grouping}_{indicator}.csv"
-    )
+    if max_age is None:
+        return False
+
+    path = _cache_path(indicator, area_grouping)
+    if not path.exists():
+        return False
+
+    return (time.time() - path.stat().st_mtime) < max_age * 86_400
 
 
 def check_area_grouping(area_grouping: str) -> list:
     """Checks if area grouping is valid and returns a list of area codes"""
 
-    if (area_grouping not in AREA_CODES.keys()) and (area_grouping != "all"):
+    if area_grouping not in AREA_GROUPINGS:
         raise ValueError('Invalid grouping. Choose from ["country", "region", "all"]')
 
     if area_grouping == "all":
-        return [group for group in AREA_CODES]
+        return list(AREA_CODES)
 
     return [area_grouping]
 
 
+@dataclass(repr=False)
 class Aids(ImportData):
     """An object to extract data from UNAIDS.
 
@@ -181,12 +325,22 @@ class Aids(ImportData):
     You can force an update by calling 'update', and all indicators will be reloaded into the object.
     You can get a dataframe by calling 'get_data' and passing the indicator name(s)
     (or None and this will return all indicators) and passing the area grouping(s) ('all' by default)
+
+    Attributes:
+        max_age: Number of days for which data saved on disk is considered up to date.
+            When set, 'update_data' skips indicators saved more recently than this.
+            Default is None, which always downloads the data again.
+        session: requests session used to download data. Default is None, which
+            uses a shared session that retries failed requests.
     """
 
+    max_age: float | None = None
+    session: requests.Session | None = None
+
     @property
     def available_indicators(self) -> pd.DataFrame:
         """Returns a dataframe of available indicators"""
-        return AVAILABLE_INDICATORS
+        return get_available_indicators()
 
     def load_data(self, indicator: str, area_grouping: str = "all") -> ImportData:
         """Load an indicator to the object
@@ -199,30 +353,43 @@ class Aids(ImportData):
             The same object to allow chaining
         """
 
-        if indicator not in list(self.available_indicators.indicator):
+        if indicator not in get_indicator_categories():
             raise ValueError(f"Invalid indicator: {indicator}")
 
-        for grouping in check_area_grouping(area_grouping):
-            # check if either indicator for grouping has not been downloaded
-            if check_if_not_downloaded(indicator, grouping):
-                df = extract_data(indicator, grouping)
-                df.to_csv(
-                    config.BBPaths.raw_data / f"aids_{grouping}_{indicator}.csv",
-                    index=False,
-                )
-
-            # load _data from disk
-            self._data[f"{indicator}_{grouping}"] = pd.read_csv(
-                config.BBPaths.raw_data / f"aids_{grouping}_{indicator}.csv"
+        # skip groupings for which the indicator is already loaded
+        groupings = [
+            grouping
+            for grouping in check_area_grouping(area_grouping)
+            if f"{indicator}_{grouping}" not in self._data
+        ]
+
+        # load _data from disk, converting CSV files if needed
+        to_download = []
+        for grouping in groupings:
+            df = load_parquet(
+                _cache_path(indicator, grouping), ".csv", engine="pyarrow", dtype=DTYPES
             )
 
+            if df is None:
+                to_download.append((indicator, grouping))
+            else:
+                self._data[f"{indicator}_{grouping}"] = df
+
+        # download any grouping for the indicator that has not been downloaded
+        for (_, grouping), df in extract_data_concurrently(
+            to_download, self.session
+        ).items():
+            save_parquet(df, _cache_path(indicator, grouping))
+            self._data[f"{indicator}_{grouping}"] = df
+
         return self
 
     def update_data(self, reload_data: bool):
         """Update all loaded indicators saved on the disk
 
         When called, it will go through each loaded indicator/area grouping combination
-        and update the data saved on disk.
+        and update the data saved on disk. If max_age is set, indicators saved on disk
+        more recently than max_age days are not downloaded again.
 
         Returns:
             The same object to allow chaining
@@ -231,20 +398,18 @@ class Aids(ImportData):
         if len(self._data) < 1:
             raise RuntimeError("No indicators loaded")
 
-        area_groupings = set([area.split("_")[1] for area in self._data])
-
-        for area_grouping in area_groupings:
-            indicators_ = set(
-                [i_.split("_")[0] for i_ in self._data if area_grouping in i_]
-            )
-            for indicator in indicators_:
-                df = extract_data(indicator, area_grouping)
-                df.to_csv(
-                    config.BBPaths.raw_data / f"aids_{area_grouping}_{indicator}.csv",
-                    index=False,
-                )
-                if reload_data:
-                    self._data[f"{indicator}_{area_grouping}"] = df
+        pairs = [
+            (indicator, area_grouping)
+            for indicator, area_grouping in (key.rsplit("_", 1) for key in self._data)
+            if not check_if_fresh(indicator, area_grouping, self.max_age)
+        ]
+
+        for (indicator, area_grouping), df in extract_data_concurrently(
+            pairs, self.session
+        ).items():
+            save_parquet(df, _cache_path(indicator, area_grouping))
+            if reload_data:
+                self._data[f"{indicator}_{area_grouping}"] = df
 
         return self
 
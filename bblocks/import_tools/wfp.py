@@ -1,13 +1,21 @@
+import io
 import json
-import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import KeysView
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, KeysView
 
 import pandas as pd
 import requests
 
 from bblocks.config import BBPaths
-from bblocks.import_tools.common import append_new_data, ImportData
+from bblocks.import_tools.common import (
+    TIMEOUT,
+    ImportData,
+    create_session,
+    save_parquet,
+)
 from bblocks.logger import logger
 
 COUNTRY_URL: str = "https://api.hungermapdata.org/covid/data"
@@ -16,13 +24,17 @@ FOOD_URL: str = (
     "https://5763353767114258.eu-central-1.fc.aliyuncs.com/2016-08-15/"
     f"proxy/wfp-data-api.36/map-data/adm0/"
 )
+MAX_WORKERS: int = 16
+
+# shared session so that connections to WFP are reused across countries
+_SESSION = create_session(pool_maxsize=MAX_WORKERS)
 
 
 def _get_country_codes() -> None:
     """Script to fetch the country codes used by WFP. Saved as a dataframe."""
 
     # Get the json file from WFP website
-    file = requests.get(COUNTRY_URL).content
+    file = _SESSION.get(COUNTRY_URL, timeout=TIMEOUT).content
 
     # WFP codes
     wfp = json.loads(file)["countries"]
@@ -33,39 +45,48 @@ def _get_country_codes() -> None:
     # Create a dataframe with the country codes and save
     df = pd.DataFrame(list(codes.items()), columns=["iso_code", "wfp_code"])
 
-    if not os.path.exists(BBPaths.wfp_data):
-        os.makedirs(BBPaths.wfp_data)
-
+    BBPaths.wfp_data.mkdir(parents=True, exist_ok=True)
     df.to_csv(BBPaths.wfp_data / r"wfp_country_codes.csv", index=False)
 
     logger.info("WFP country codes successfully downloaded.")
 
 
-def _read_wfp_country_codes() -> dict:
-    """Returns a dictionary with the country codes used by WFP."""
-    file_path = BBPaths.wfp_data / "wfp_country_codes.csv"
+@lru_cache(maxsize=None)
+def _load_wfp_country_codes(file_path: Path) -> dict:
+    """Reads the country codes saved at file_path, downloading them if needed.
+    The result is cached for each path and should not be modified."""
 
-    if not os.path.exists(file_path):
+    if not file_path.exists():
         _get_country_codes()
 
     d = pd.read_csv(file_path)
     return dict(zip(d["iso_code"], d["wfp_code"].astype(int)))
 
 
+def _read_wfp_country_codes() -> dict:
+    """Returns a dictionary with the country codes used by WFP."""
+
+    return _load_wfp_country_codes(BBPaths.wfp_data / "wfp_country_codes.csv")
+
+
 def _get_inflation(
     country_iso: str,
 ) -> None:
     """Get inflation data from VAM for a single country based on iso code"""
 
     try:
+        response = _SESSION.get(INFLATION_URL + country_iso, timeout=TIMEOUT)
+        response.raise_for_status()
+
+        # drop the two footer lines so the file can be read with the C engine
+        content = b"\n".join(response.content.rstrip().splitlines()[:-2])
         df = pd.read_csv(
-            INFLATION_URL + country_iso,
+            io.BytesIO(content),
             usecols=[0, 1, 2],
-            skipfooter=2,
-            engine="python",
             parse_dates=["Time"],
+            date_format="ISO8601",
         )
-    except ConnectionError:
+    except (ConnectionError, requests.exceptions.ConnectionError):
         print(f"Data not available for {country_iso}")
         return
 
@@ -81,19 +102,16 @@ def _get_inflation(
         .sort_values(by=["indicator", "date"])
     )
 
-    if not os.path.exists(BBPaths.wfp_data):
-        os.makedirs(BBPaths.wfp_data)
+    _save_file(df, country_iso, "inflation")
 
     logger.info(f"VAM inflation data for {country_iso} successfully downloaded.")
 
-    df.to_csv(BBPaths.wfp_data / f"{country_iso}_inflation.csv", index=False)
-
 
 def _get_insufficient_food(code: int, iso: str) -> None:
     """Get food consumption data from WFP"""
 
     # Get the json file from WFP website. If empty return None
-    r = requests.get(FOOD_URL + f"{code}/countryData.json")
+    r = _SESSION.get(FOOD_URL + f"{code}/countryData.json", timeout=TIMEOUT)
 
     # Check if response is invalid return None
     if r.status_code == 404:
@@ -107,53 +125,103 @@ def _get_insufficient_food(code: int, iso: str) -> None:
         return None
 
     # If _data is valid, clean it and save to munged
-    data = (
-        data.rename(
-            columns=(
-                {
-                    "x": "date",
-                    "fcs": "value",
-                    "fcsHigh": "value_high",
-                    "fcsLow": "value_low",
-                }
-            )
-        )
-        .assign(date=lambda d: pd.to_datetime(d.date, format="%Y-%m-%d"), iso_code=iso)
-        .pipe(
-            append_new_data, BBPaths.wfp_data / f"{iso}_insufficient_food.csv", "date"
+    data = data.rename(
+        columns=(
+            {
+                "x": "date",
+                "fcs": "value",
+                "fcsHigh": "value_high",
+                "fcsLow": "value_low",
+            }
         )
-    )
+    ).assign(date=lambda d: pd.to_datetime(d.date, format="%Y-%m-%d"), iso_code=iso)
 
-    if not os.path.exists(BBPaths.wfp_data):
-        os.makedirs(BBPaths.wfp_data)
+    # the API returns the full series, so it replaces the data already saved
+    data = data.drop_duplicates(subset=["date"], keep="last").reset_index(drop=True)
 
-    data.to_csv(BBPaths.wfp_data / f"{iso}_insufficient_food.csv", index=False)
+    _save_file(data, iso, "insufficient_food")
     logger.info(f"Insufficient food data for {iso} successfully downloaded.")
 
 
+def _file_path(iso_code: str, file_name: str) -> Path:
+    """Returns the path where the data for a country and indicator is saved"""
+
+    return BBPaths.wfp_data / f"{iso_code}_{file_name}.parquet"
+
+
+def _save_file(df: pd.DataFrame, iso_code: str, file_name: str) -> None:
+    """Saves the data for a country and indicator"""
+
+    save_parquet(df, _file_path(iso_code, file_name))
+
+    # the combined file for the indicator is now out of date
+    _combined_path(file_name).unlink(missing_ok=True)
+
+
 def _read_files(iso_code: str, file_name: str) -> pd.DataFrame:
+    path = _file_path(iso_code, file_name)
+
+    try:
+        return pd.read_parquet(path)
+    except FileNotFoundError:
+        pass
+
+    # country files downloaded before the switch to parquet
     try:
         return pd.read_csv(
-            BBPaths.wfp_data / f"{iso_code}_{file_name}.csv", parse_dates=["date"]
+            path.with_suffix(".csv"), parse_dates=["date"], date_format="%Y-%m-%d"
         )
-
     except FileNotFoundError:
         return pd.DataFrame()
 
 
+def _read_all_files(iso_codes: Iterable[str], file_name: str) -> list[pd.DataFrame]:
+    """Read the files for the given iso codes in parallel, dropping empty ones."""
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        frames = executor.map(lambda iso: _read_files(iso, file_name), iso_codes)
+        return [df for df in frames if len(df) > 0]
+
+
+def _combined_path(file_name: str) -> Path:
+    """Returns the path where the data for all countries for an indicator is saved"""
+
+    return BBPaths.wfp_data / f"{file_name}.parquet"
+
+
+def _save_combined_file(iso_codes: Iterable[str], file_name: str) -> None:
+    """Combine the files for the given iso codes into a single file"""
+
+    frames = _read_all_files(iso_codes, file_name)
+
+    if len(frames) > 0:
+        save_parquet(pd.concat(frames, ignore_index=True), _combined_path(file_name))
+
+
+def _read_indicator_files(iso_codes: list, file_name: str) -> list[pd.DataFrame]:
+    """Read the data for the given iso codes from the combined file if it exists,
+    otherwise from the individual country files."""
+
+    try:
+        data = pd.read_parquet(_combined_path(file_name))
+    except FileNotFoundError:
+        return _read_all_files(iso_codes, file_name)
+
+    data = data.loc[data.iso_code.isin(iso_codes)]
+
+    return [data] if len(data) > 0 else []
+
+
 def _read_insufficient_food(iso_codes: list) -> pd.DataFrame:
     """Read and merge the data for the given iso codes."""
 
-    data = pd.DataFrame()
-
-    for iso in iso_codes:
-        data = pd.concat(
-            [data, _read_files(iso, "insufficient_food")], ignore_index=True
-        )
+    frames = _read_indicator_files(iso_codes, "insufficient_food")
 
-    if len(data) == 0:
+    if len(frames) == 0:
         print("No insufficient food data available. Run update to download _data")
-        return data
+        return pd.DataFrame()
+
+    data = pd.concat(frames, ignore_index=True)
 
     return (
         data.sort_values(by=["iso_code", "date"])
@@ -165,14 +233,13 @@ def _read_insufficient_food(iso_codes: list) -> pd.DataFrame:
 def _read_inflation(iso_codes: list) -> pd.DataFrame:
     """Read and merge the data for the given iso codes."""
 
-    data = pd.DataFrame()
+    frames = _read_indicator_files(iso_codes, "inflation")
 
-    for iso in iso_codes:
-        data = pd.concat([data, _read_files(iso, "inflation")], ignore_index=True)
-
-    if len(data) == 0:
+    if len(frames) == 0:
         print("No inflation data available. Run update to download data")
-        return data
+        return pd.DataFrame()
+
+    data = pd.concat(frames, ignore_index=True)
 
     return data.sort_values(by=["iso_code", "date"]).reset_index(drop=True)
 
@@ -212,14 +279,22 @@ class WFPData(ImportData):
         if len(self._data) == 0:
             raise RuntimeError("No indicators loaded. Load indicators before updating")
 
+        codes = self._country_codes()
+        BBPaths.wfp_data.mkdir(parents=True, exist_ok=True)
+
+        # one request per country, spread over the worker threads
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            for indicator in self._data.keys():
+                if indicator == "inflation":
+                    _ = list(executor.map(_get_inflation, codes))
+                elif indicator == "insufficient_food":
+                    _ = list(
+                        executor.map(_get_insufficient_food, codes.values(), codes)
+                    )
+
+        # combine the country files so they can be read in a single pass
         for indicator in self._data.keys():
-            if indicator == "inflation":
-                _ = [_get_inflation(iso) for iso in self._country_codes()]
-            elif indicator == "insufficient_food":
-                _ = [
-                    _get_insufficient_food(code, iso)
-                    for iso, code in self._country_codes().items()
-                ]
+            _save_combined_file(codes, indicator)
 
         logger.info("Data correctly updated.")
 
@@ -1,22 +1,36 @@
 """Tools to extract _data from WHO"""
 
+import io
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 import requests
 
 from bblocks.config import BBPaths
-from bblocks.import_tools.common import ImportData
+from bblocks.import_tools.common import (
+    EXCEL_ENGINE,
+    ImportData,
+    conditional_download,
+    convert_legacy_file,
+    save_parquet,
+)
 
 GHED_URL: str = "https://apps.who.int/nha/database/Home/IndicatorsDownload/en"
 
 
 def extract_ghed_data() -> bytes:
-    """Extract GHED dataset"""
+    """Extract GHED dataset
+
+    If WHO sends headers to revalidate it, the file is kept on disk and only
+    downloaded again if WHO reports that it has changed since it was saved.
+    """
 
     try:
-        return requests.get(GHED_URL).content
+        with conditional_download(GHED_URL, BBPaths.raw_data / "ghed.xlsx") as path:
+            return path.read_bytes()
 
-    except ConnectionError:
+    except (ConnectionError, requests.exceptions.ConnectionError):
         raise ConnectionError("Could not connect to WHO GHED database")
 
 
@@ -33,7 +47,8 @@ def _clean_ghed_codes(df: pd.DataFrame) -> pd.DataFrame:
             "Category 2": "category_2",
             "Indicator units": "indicator_units",
             "Indicator currency": "indicator_currency",
-        }
+        },
+        copy=False,
     ).replace({"-": np.nan})
 
 
@@ -49,7 +64,8 @@ def _clean_ghed_data(df: pd.DataFrame) -> pd.DataFrame:
             "region (WHO)": "region",
             "region": "region",
             "income": "income_group",
-        }
+        },
+        copy=False,
     ).melt(
         id_vars=["country_name", "country_code", "region", "income_group", "year"],
         var_name="indicator_code",
@@ -78,28 +94,43 @@ def _clean_metadata(df: pd.DataFrame) -> pd.DataFrame:
             "Methods of estimation": "methods_of_estimation",
             "Data type": "data_type",
             "Footnote": "footnote",
-        }
+        },
+        copy=False,
     )
 
 
+def _ghed_path(name: str) -> Path:
+    """Returns the path where the GHED data or metadata is saved"""
+
+    return BBPaths.raw_data / f"ghed_{name}.parquet"
+
+
 def download_ghed() -> None:
     """Download GHED dataset to disk"""
 
-    ghed_content = extract_ghed_data()
+    # the workbook is opened once and each sheet parsed from it
+    with pd.ExcelFile(io.BytesIO(extract_ghed_data()), engine=EXCEL_ENGINE) as workbook:
+        data = workbook.parse(sheet_name="Data").pipe(_clean_ghed_data)
+        codes = workbook.parse(sheet_name="Codebook").pipe(_clean_ghed_codes)
+        metadata = workbook.parse(sheet_name="Metadata").pipe(_clean_metadata)
+
+    # the merge key uses the categories of the data in both frames, so the join is
+    # done on integer codes instead of strings. Codebook entries without data are
+    # not matched by the left merge
+    key = pd.CategoricalDtype(data["indicator_code"].unique())
+    data["indicator_code"] = data["indicator_code"].astype(key)
+    codes["indicator_code"] = codes["indicator_code"].astype(key)
 
     # _data
-    data = pd.read_excel(ghed_content, sheet_name="Data").pipe(_clean_ghed_data)
-    codes = pd.read_excel(ghed_content, sheet_name="Codebook").pipe(_clean_ghed_codes)
-    pd.merge(data, codes, on="indicator_code", how="left").to_feather(
-        BBPaths.raw_data / "ghed_data.feather"
+    save_parquet(
+        pd.merge(data, codes, on="indicator_code", how="left").astype(
+            {"indicator_code": object}
+        ),
+        _ghed_path("data"),
     )
 
     # metadata
-    (
-        pd.read_excel(ghed_content, sheet_name="Metadata")
-        .pipe(_clean_metadata)
-        .to_feather(BBPaths.raw_data / "ghed_metadata.feather")
-    )
+    save_parquet(metadata, _ghed_path("metadata"))
 
 
 class GHED(ImportData):
@@ -122,11 +153,14 @@ class GHED(ImportData):
             The same object to allow chaining
         """
 
-        if not (BBPaths.raw_data / "ghed_data.feather").exists():
+        for name in ["data", "metadata"]:
+            convert_legacy_file(_ghed_path(name), ".feather")
+
+        if not _ghed_path("data").exists():
             download_ghed()
 
-        self._raw_data = pd.read_feather(BBPaths.raw_data / "ghed_data.feather")
-        self._metadata = pd.read_feather(BBPaths.raw_data / "ghed_metadata.feather")
+        self._raw_data = pd.read_parquet(_ghed_path("data"))
+        self._metadata = pd.read_parquet(_ghed_path("metadata"))
 
         # Load all data
         self._data["all"] = self._raw_data
@@ -143,8 +177,8 @@ class GHED(ImportData):
         download_ghed()
 
         if reload_data:
-            self._raw_data = pd.read_feather(BBPaths.raw_data / "ghed_data.feather")
-            self._metadata = pd.read_feather(BBPaths.raw_data / "ghed_metadata.feather")
+            self._raw_data = pd.read_parquet(_ghed_path("data"))
+            self._metadata = pd.read_parquet(_ghed_path("metadata"))
 
             # Load all data
             self._data["all"] = self._raw_data
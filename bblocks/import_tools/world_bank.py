@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import field, dataclass
 
 import numpy as np
@@ -8,12 +9,18 @@ import wbgapi as wb
 
 from bblocks.cleaning_tools.clean import convert_to_datetime
 from bblocks.config import BBPaths
-from bblocks.import_tools.common import ImportData
+from bblocks.import_tools.common import (
+    EXCEL_ENGINE,
+    ImportData,
+    load_parquet,
+    save_parquet,
+)
 
 PINK_SHEET_URL = (
     "https://thedocs.worldbank.org/en/doc/5d903e848db1d1b83e0ec8f744e55570-0350012021/"
     "related/CMO-Historical-Data-Monthly.xlsx"
 )
+MAX_WORKERS: int = 8
 
 
 def _get_wb_data(
@@ -107,7 +114,7 @@ class WorldBankData(ImportData):
             )
             file_name = (
                 f"{ind_}_{years_str}_"
-                f"{'most_recent' if most_recent_only else ''}.csv"
+                f"{'most_recent' if most_recent_only else ''}.parquet"
             )
 
             _params = {
@@ -118,12 +125,13 @@ class WorldBankData(ImportData):
                 "db": db,
             }
 
-            # get the indicator _data if it's not saved on disk.
+            # get the indicator _data if it's not saved on disk. Data which has just
+            # been downloaded is used directly instead of reading it back from disk
             path = BBPaths.raw_data / f"{file_name}"
-            if not path.exists():
-                _get_wb_data(**_params).to_csv(path, index=False)
-
-            _data = pd.read_csv(path, parse_dates=["date"])
+            _data = load_parquet(path, ".csv", parse_dates=["date"])
+            if _data is None:
+                _data = _get_wb_data(**_params)
+                save_parquet(_data, path)
 
             _params["file_name"] = file_name
 
@@ -132,8 +140,9 @@ class WorldBankData(ImportData):
         if isinstance(indicator, str):
             indicator = [indicator]
 
-        # load the indicator(s) data
-        [_load_indicator(ind) for ind in indicator]
+        # indicators are fetched on a thread pool, so slow requests overlap
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            list(executor.map(_load_indicator, indicator))
 
         return self
 
@@ -150,12 +159,21 @@ class WorldBankData(ImportData):
         if len(self._indicators) == 0:
             raise RuntimeError("No indicators loaded")
 
-        for _, (_, args) in self._indicators.items():
-            file_name = args.pop("file_name")
-            _get_wb_data(**args).to_csv(BBPaths.raw_data / f"{file_name}", index=False)
+        def _update_indicator(args: dict) -> None:
+            params = {k: v for k, v in args.items() if k != "file_name"}
+            _data = _get_wb_data(**params)
+            save_parquet(_data, BBPaths.raw_data / f"{args['file_name']}")
 
             if reload_data:
-                self.load_data(**args)
+                self._indicators[args["indicator"]] = _data, args
+
+        # as in load_data, the indicator requests run on a thread pool
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            list(
+                executor.map(
+                    _update_indicator, [args for _, args in self._indicators.values()]
+                )
+            )
 
         return self
 
@@ -170,29 +188,29 @@ def clean_prices(df: pd.DataFrame) -> pd.DataFrame:
     """Clean Pink Sheet price _data"""
 
     df.columns = df.iloc[3]
-    unit_dict = (
-        df.iloc[4]
-        .str.replace("(", "", regex=False)
-        .str.replace(")", "", regex=False)
-        .dropna()
-        .to_dict()
-    )
+    unit_dict = df.iloc[4].dropna().str.translate(str.maketrans("", "", "()")).to_dict()
+
+    # clean indicator names once per column, instead of once per row after melting
+    name_dict = {
+        c: c.translate(str.maketrans("", "", "*")).strip()
+        for c in df.columns
+        if isinstance(c, str)
+    }
 
     df = (
         df.rename(columns={np.nan: "period"})
         .iloc[6:]
         .replace("..", np.nan)
         .reset_index(drop=True)
+        # parse the dates before melting, so each period is parsed only once
+        .assign(period=lambda d: pd.to_datetime(d.period, format="%YM%m"))
         .melt(id_vars="period", var_name="indicator", value_name="value")
     )
 
-    df = df.assign(
-        units=lambda d: d.indicator.map(unit_dict),
-        period=lambda d: pd.to_datetime(d.period, format="%YM%m"),
-    )
+    df = df.assign(units=lambda d: d.indicator.map(unit_dict))
 
     df = df.assign(
-        indicator=lambda d: d.indicator.str.replace("*", "", regex=False).str.strip(),
+        indicator=lambda d: d.indicator.map(name_dict),
         value=lambda d: pd.to_numeric(d.value, errors="coerce"),
     )
 
@@ -243,10 +261,14 @@ def read_pink_sheet(indicator: str) -> pd.DataFrame:
     """
 
     if indicator == "prices":
-        df = pd.read_excel(PINK_SHEET_URL, sheet_name="Monthly Prices")
+        df = pd.read_excel(
+            PINK_SHEET_URL, sheet_name="Monthly Prices", engine=EXCEL_ENGINE
+        )
         return clean_prices(df)
     elif indicator == "indices":
-        df = pd.read_excel(PINK_SHEET_URL, sheet_name="Monthly Indices")
+        df = pd.read_excel(
+            PINK_SHEET_URL, sheet_name="Monthly Indices", engine=EXCEL_ENGINE
+        )
         return clean_index(df)
     else:
         raise ValueError("Invalid indicator. Choose from 'prices' or 'indices'")
@@ -281,12 +303,13 @@ class PinkSheet(ImportData):
             The same object to allow chaining
         """
 
-        file_path = BBPaths.raw_data / f"pink_sheet_{indicator}.csv"
-        if not file_path.exists():
+        file_path = BBPaths.raw_data / f"pink_sheet_{indicator}.parquet"
+        df = load_parquet(file_path, ".csv", parse_dates=["period"])
+        if df is None:
             df = read_pink_sheet(indicator)
-            df.to_csv(file_path, index=False)
+            save_parquet(df, file_path)
 
-        self._data[indicator] = pd.read_csv(file_path)
+        self._data[indicator] = df
 
         return self
 
@@ -301,9 +324,9 @@ class PinkSheet(ImportData):
         """
 
         for indicator in self._data:
-            file_path = BBPaths.raw_data / f"pink_sheet_{indicator}.csv"
+            file_path = BBPaths.raw_data / f"pink_sheet_{indicator}.parquet"
             df = read_pink_sheet(indicator)
-            df.to_csv(file_path, index=False)
+            save_parquet(df, file_path)
 
             if reload_data:
                 self._data[indicator] = df
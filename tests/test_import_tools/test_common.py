@@ -2,31 +2,33 @@
 
 import pytest
 import requests
-from unittest.mock import patch
+from unittest.mock import MagicMock, Mock, patch
 from zipfile import ZipFile
 import tempfile
 import os
 import io
 
+import pandas as pd
+
 from bblocks.import_tools import common
 
 
 def test_get_response():
-    with patch("requests.get") as mock_get:
+    with patch.object(common.SESSION, "get") as mock_get:
         mock_get.return_value.raise_for_status.return_value = None
         mock_get.return_value.status_code = 200
 
         url = "https://www.example.com"
         response = common.get_response(url)
 
-        mock_get.assert_called_once_with(url)
+        mock_get.assert_called_once_with(url, timeout=common.TIMEOUT)
         assert response.status_code == 200
 
 
 def test_get_response_status_not_200():
     """test get_response function when the status code is not 200"""
 
-    with patch("requests.get") as mock_get:
+    with patch.object(common.SESSION, "get") as mock_get:
         mock_get.return_value.raise_for_status.side_effect = (
             requests.exceptions.HTTPError
         )
@@ -36,13 +38,13 @@ def test_get_response_status_not_200():
         with pytest.raises(requests.exceptions.HTTPError):
             common.get_response(url)
 
-        mock_get.assert_called_once_with(url)
+        mock_get.assert_called_once_with(url, timeout=common.TIMEOUT)
 
 
 def test_get_response_connection_error():
     """test get_response function when there is a connection error"""
 
-    with patch("requests.get") as mock_get:
+    with patch.object(common.SESSION, "get") as mock_get:
         mock_get.return_value.raise_for_status.side_effect = (
             requests.exceptions.ConnectionError
         )
@@ -51,7 +53,20 @@ def test_get_response_connection_error():
         with pytest.raises(requests.exceptions.ConnectionError):
             common.get_response(url)
 
-        mock_get.assert_called_once_with(url)
+        mock_get.assert_called_once_with(url, timeout=common.TIMEOUT)
+
+
+def test_get_response_session():
+    """test get_response function with a session passed as an argument"""
+
+    session = Mock()
+    session.get.return_value.status_code = 200
+
+    url = "https://www.example.com"
+    response = common.get_response(url, session)
+
+    session.get.assert_called_once_with(url, timeout=common.TIMEOUT)
+    assert response.status_code == 200
 
 
 def test_unzip():
@@ -90,3 +105,119 @@ def test_unzip_valid_path():
         assert isinstance(common.unzip(temp.name), ZipFile)
     # remove the tempfile after the test
     os.remove(temp.name)
+
+
+def _mock_download(status_code: int, content: list[bytes], headers: dict) -> MagicMock:
+    """mocks a streamed response used as a context manager"""
+
+    response = MagicMock(status_code=status_code, headers=headers)
+    response.__enter__.return_value = response
+    response.iter_content.return_value = content
+
+    return response
+
+
+def test_conditional_download(tmp_path):
+    """Test that conditional_download reuses the saved file when it is not modified"""
+
+    first = _mock_download(200, [b"z", b"ip"], {"ETag": '"abc"'})
+    not_modified = _mock_download(304, [], {})
+
+    session = Mock()
+    session.request.side_effect = [first, not_modified]
+
+    url = "https://www.example.com/file.zip"
+    path = tmp_path / "file.zip"
+
+    with common.conditional_download(url, path, session) as downloaded:
+        assert downloaded == path
+    assert path.read_bytes() == b"zip"
+
+    with common.conditional_download(url, path, session) as downloaded:
+        assert downloaded == path
+
+    assert session.request.call_args_list[0].kwargs["headers"] == {}
+    assert session.request.call_args.kwargs["headers"] == {"If-None-Match": '"abc"'}
+    not_modified.iter_content.assert_not_called()
+
+
+def test_conditional_download_error(tmp_path):
+    """Test that conditional_download does not save failed downloads"""
+
+    error = _mock_download(503, [b"error"], {"ETag": '"e"'})
+    error.raise_for_status.side_effect = requests.exceptions.HTTPError
+    failed_stream = _mock_download(200, [], {})
+    failed_stream.iter_content.side_effect = ConnectionResetError
+
+    session = Mock()
+    session.request.side_effect = [error, failed_stream]
+
+    url = "https://www.example.com/file.zip"
+    path = tmp_path / "downloads" / "file.zip"
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        with common.conditional_download(url, path, session):
+            pass
+
+    # the partial file is removed if the stream fails
+    with pytest.raises(ConnectionResetError):
+        with common.conditional_download(url, path, session):
+            pass
+
+    assert list(path.parent.iterdir()) == []
+
+
+def test_conditional_download_no_validators(tmp_path):
+    """Test that files which cannot be revalidated are not kept on disk"""
+
+    session = Mock()
+    session.request.return_value = _mock_download(200, [b"zip"], {})
+
+    path = tmp_path / "file.zip"
+
+    with common.conditional_download("https://www.example.com/file.zip", path, session):
+        assert path.read_bytes() == b"zip"
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("legacy_suffix", [".csv", ".feather"])
+def test_convert_legacy_file(tmp_path, legacy_suffix):
+    """Test that convert_legacy_file converts legacy files to parquet"""
+
+    path = tmp_path / "data.parquet"
+    legacy_path = path.with_suffix(legacy_suffix)
+
+    assert common.convert_legacy_file(path, legacy_suffix) is None
+
+    df = pd.DataFrame({"iso_code": ["FRA"], "value": [1.0]})
+    if legacy_suffix == ".csv":
+        df.to_csv(legacy_path, index=False)
+    else:
+        df.to_feather(legacy_path)
+
+    pd.testing.assert_frame_equal(common.convert_legacy_file(path, legacy_suffix), df)
+    pd.testing.assert_frame_equal(pd.read_parquet(path), df)
+    assert legacy_path.exists()
+
+    # data already saved as parquet is not replaced
+    df.to_csv(path.with_suffix(".csv"), index=False)
+    assert common.convert_legacy_file(path, ".csv") is None
+
+
+def test_save_and_load_parquet(tmp_path):
+    """Test that load_parquet reads saved data, falling back to a legacy file"""
+
+    path = tmp_path / "folder" / "data.parquet"
+    df = pd.DataFrame({"iso_code": ["FRA"], "value": [1.0]})
+
+    assert common.load_parquet(path, ".csv") is None
+
+    common.save_parquet(df, path)
+    pd.testing.assert_frame_equal(common.load_parquet(path, ".csv"), df)
+
+    # a legacy file is converted when no parquet file is saved
+    path.unlink()
+    df.to_csv(path.with_suffix(".csv"), index=False)
+    pd.testing.assert_frame_equal(common.load_parquet(path, ".csv"), df)
+    assert path.exists()
@@ -1,5 +1,9 @@
+from contextlib import nullcontext
+from unittest.mock import patch
+
 import pandas as pd
 import pytest
+import requests
 
 from bblocks.import_tools import unaids
 from bblocks import set_bblocks_data_path, config
@@ -370,6 +374,37 @@ def test_clean_data():
     pd.testing.assert_frame_equal(df, expected_df)
 
 
+def test_response_to_df_region():
+    """test response_to_df cleans region and global data separately"""
+
+    response = _mock_unaids_response()
+
+    # upper estimate missing for every region but available globally
+    for row in response["tableData"]:
+        for values in row["Data_Val"]:
+            values[0][2] = None
+
+    indicator = "People living with HIV - All ages"
+    result = unaids.response_to_df("region", response, indicator)
+
+    expected = pd.concat(
+        [
+            unaids.parse_data_table(response, DIMENSIONS, YEARS).pipe(
+                unaids.clean_data, indicator
+            ),
+            unaids.parse_global_data(response, DIMENSIONS, YEARS).pipe(
+                unaids.clean_data, indicator
+            ),
+        ],
+        ignore_index=True,
+    ).astype(unaids.DTYPES)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(result) == 27
+    assert result.value.notna().all()
+    assert (result.area_name.iloc[-9:] == "Global").all()
+
+
 def test_get_category():
     """test get_category"""
 
@@ -496,3 +531,68 @@ def test_get_data():
     d = aids.get_data()
 
     assert len(d) == 0
+
+
+def test_check_if_fresh(tmp_path, monkeypatch):
+    """test check_if_fresh"""
+
+    monkeypatch.setattr(unaids.BBPaths, "raw_data", tmp_path)
+    indicator = "People living with HIV - All ages"
+
+    # no file saved
+    assert not unaids.check_if_fresh(indicator, "country", 7)
+
+    unaids._cache_path(indicator, "country").touch()
+
+    assert unaids.check_if_fresh(indicator, "country", 7)
+    assert not unaids.check_if_fresh(indicator, "country", None)
+    assert not unaids.check_if_fresh(indicator, "country", 0)
+
+
+def test_get_response(tmp_path, monkeypatch):
+    """test that get_response posts the request and parses the saved response"""
+
+    monkeypatch.setattr(unaids.BBPaths, "raw_data", tmp_path)
+    params = unaids.response_params("country", "People living with HIV - All ages")
+
+    path = tmp_path / "response.json"
+    path.write_bytes(b'{"a": 1}')
+
+    with patch.object(
+        unaids, "conditional_download", return_value=nullcontext(path)
+    ) as download:
+        assert unaids.get_response(**params) == {"a": 1}
+
+    assert download.call_args.kwargs["method"] == "POST"
+    assert download.call_args.kwargs["data"]["reqObj[TabStatus]"] == "world"
+    assert download.call_args.args[1].parent == tmp_path / "aids_responses"
+
+    with patch.object(
+        unaids,
+        "conditional_download",
+        side_effect=requests.exceptions.ConnectionError,
+    ):
+        with pytest.raises(ConnectionError, match="Could not extract data"):
+            unaids.get_response(**params)
+
+
+def test_load_data_legacy_csv(tmp_path, monkeypatch):
+    """test that load_data converts data saved as CSV instead of downloading it"""
+
+    monkeypatch.setattr(unaids.BBPaths, "raw_data", tmp_path)
+    indicator = "People living with HIV - All ages"
+
+    response = _mock_unaids_response()
+    df = unaids.response_to_df("country", response, indicator)
+    df.to_csv(tmp_path / f"aids_country_{indicator}.csv", index=False)
+
+    with patch.object(unaids, "extract_data_concurrently") as extract:
+        aids = unaids.Aids().load_data(indicator, "country")
+        extract.assert_called_once_with([], aids.session)
+
+    pd.testing.assert_frame_equal(aids._data[f"{indicator}_country"], df)
+    assert (tmp_path / f"aids_country_{indicator}.csv").exists()
+    assert unaids._cache_path(indicator, "country").exists()
+
+    converted = pd.read_parquet(unaids._cache_path(indicator, "country"))
+    pd.testing.assert_frame_equal(converted, df)
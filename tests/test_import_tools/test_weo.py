@@ -1,6 +1,7 @@
 """Tests for the WEO data import tool."""
 
 import pytest
+from contextlib import nullcontext
 from datetime import datetime
 import xml.etree.ElementTree as ET
 from unittest.mock import Mock, patch
@@ -113,6 +114,31 @@ def test_extract_data():
     ]
 
 
+def test_convert_series_codes():
+    """Test that codes are converted using the code lists in the schema file."""
+
+    schema = (
+        '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">'
+        '<xs:simpleType name="IMF.CL_FREQ.1.0"><xs:restriction>'
+        '<xs:enumeration value="A"><xs:annotation>'
+        "<xs:documentation>Annual</xs:documentation>"
+        "</xs:annotation></xs:enumeration>"
+        "</xs:restriction></xs:simpleType>"
+        "</xs:schema>"
+    )
+
+    parser = imf_weo.Parser(folder=Mock())
+    parser.schema_file = ET.fromstring(schema)
+
+    result = parser._convert_series_codes(pd.Series(["A", "Q", "A"]), "IMF.CL_FREQ.1.0")
+
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert result.iloc[0] == "Annual"
+    assert result.iloc[2] == "Annual"
+    assert pd.isna(result.iloc[1])
+    assert parser.code_maps == {"IMF.CL_FREQ.1.0": {"A": "Annual"}}
+
+
 @patch("bblocks.import_tools.imf_weo.datetime")
 def test_gen_latest_version(mock_datetime):
     """Test gen_latest_version function."""
@@ -146,6 +172,19 @@ def test_roll_back_version():
         imf_weo.roll_back_version((2025, 3))
 
 
+@patch("bblocks.import_tools.imf_weo.gen_latest_version", return_value=(2025, 2))
+def test_find_latest_version(mock_gen_latest_version):
+    """Test find_latest_version function."""
+
+    hrefs = {(2025, 2): None, (2025, 1): "/file.zip"}
+    with patch.object(imf_weo, "get_sdmx_href", side_effect=lambda v, s: hrefs[v]):
+        assert imf_weo.find_latest_version() == ((2025, 1), "/file.zip")
+
+    with patch.object(imf_weo, "get_sdmx_href", return_value=None):
+        with pytest.raises(ValueError):
+            imf_weo.find_latest_version()
+
+
 def test_parse_sdmx_query_response():
     """Test parse_sdmx_query_response function."""
 
@@ -154,6 +193,32 @@ def test_parse_sdmx_query_response():
 
     assert imf_weo._parse_sdmx_query_response("") is None
 
+    mocked_content = b'<a class="link" href="/file.zip?a=1&amp;b=2"> SDMX Data </a>'
+    assert imf_weo._parse_sdmx_query_response(mocked_content) == "/file.zip?a=1&b=2"
+
+
+def test_download_file(tmp_path, monkeypatch):
+    """Test that download_file saves WEO files under raw_data, removing old ones."""
+
+    monkeypatch.setattr(imf_weo.BBPaths, "raw_data", tmp_path)
+    url = "https://www.example.com/file.zip"
+
+    folder = tmp_path / "weo_responses"
+    folder.mkdir()
+    (folder / "old.zip").write_bytes(b"old")
+    (folder / "old.validators.json").write_text("{}")
+
+    def _mock_download(url, path, session):
+        path.write_bytes(b"new")
+        return nullcontext(path)
+
+    with patch.object(imf_weo, "conditional_download", side_effect=_mock_download):
+        with imf_weo.download_file(url) as path:
+            assert path.parent == folder
+            assert path.suffix == ".zip"
+
+    assert list(folder.iterdir()) == [path]
+
 
 class TestWEO:
     """Test the WEO class."""
@@ -170,4 +235,4 @@ class TestWEO:
     def test_weo_class_invalid_version(self):
         invalid_version = "2022"
         with pytest.raises(ValueError):
-            imf_weo.WEO(version=invalid_version)
\ No newline at end of file
+            imf_weo.WEO(version=invalid_version)
@@ -1,6 +1,8 @@
 import os
 from typing import KeysView
+from unittest.mock import Mock, patch
 
+import pandas as pd
 import pytest
 
 from bblocks import set_bblocks_data_path, config
@@ -13,7 +15,53 @@ set_bblocks_data_path(config.BBPaths.tests_data)
 def test__get_inflation():
     assert wfp._get_inflation("nonsense") is None
 
-    os.remove(BBPaths.wfp_data / r"nonsense_inflation.csv")
+    os.remove(BBPaths.wfp_data / r"nonsense_inflation.parquet")
+
+
+def test__get_inflation_footer(tmp_path, monkeypatch):
+    # the folder is created if it does not exist
+    monkeypatch.setattr(BBPaths, "wfp_data", tmp_path / "wfp")
+
+    response = Mock(
+        content=b"Time,Value (percent),Indicator\r\n"
+        b"2020-01-01,1.5,Food Inflation\r\n"
+        b"Source: WFP\r\nfooter\r\n"
+    )
+    with patch.object(wfp._SESSION, "get", return_value=response):
+        wfp._get_inflation("AAA")
+
+    df = pd.read_parquet(tmp_path / "wfp" / "AAA_inflation.parquet")
+    assert df.to_dict("records") == [
+        {
+            "date": pd.Timestamp("2020-01-01"),
+            "value": 1.5,
+            "indicator": "Food Inflation",
+            "iso_code": "AAA",
+        }
+    ]
+
+
+def test__get_insufficient_food(tmp_path, monkeypatch):
+    monkeypatch.setattr(BBPaths, "wfp_data", tmp_path)
+    pd.DataFrame({"date": ["2020-01-01"], "value": [1], "iso_code": ["AAA"]}).to_csv(
+        tmp_path / "AAA_insufficient_food.csv", index=False
+    )
+
+    response = Mock(status_code=200)
+    response.json.return_value = {
+        "fcsGraph": [
+            {"x": "2020-01-02", "fcs": 2},
+            {"x": "2020-01-02", "fcs": 3},
+        ]
+    }
+    with patch.object(wfp._SESSION, "get", return_value=response):
+        wfp._get_insufficient_food(1, "AAA")
+
+    # the full series is saved as parquet, which is read before the legacy CSV
+    assert (tmp_path / "AAA_insufficient_food.csv").exists()
+    df = wfp._read_files("AAA", "insufficient_food")
+    assert df.value.tolist() == [3]
+    assert df.date.tolist() == [pd.Timestamp("2020-01-02")]
 
 
 def test_available_indicators():
@@ -63,3 +111,37 @@ def test_get_data():
         )
         == set()
     )
+
+
+def test_update_data(tmp_path, monkeypatch):
+    test_obj = wfp.WFPData()
+    test_obj.load_data("insufficient_food")
+    monkeypatch.setattr(BBPaths, "wfp_data", tmp_path)
+
+    codes = {"AAA": 1, "BBB": 2}
+    with patch.object(wfp, "_read_wfp_country_codes", return_value=codes):
+        with patch.object(wfp, "_get_insufficient_food") as mock_get:
+            test_obj.update_data(reload_data=False)
+
+    assert sorted(c.args for c in mock_get.call_args_list) == [(1, "AAA"), (2, "BBB")]
+
+
+def test_combined_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(BBPaths, "wfp_data", tmp_path)
+    for iso in ["AAA", "BBB"]:
+        wfp._save_file(
+            pd.DataFrame({"date": pd.to_datetime(["2020-01-01"]), "iso_code": [iso]}),
+            iso,
+            "inflation",
+        )
+
+    wfp._save_combined_file(["AAA", "BBB"], "inflation")
+    assert (tmp_path / "inflation.parquet").exists()
+
+    frames = wfp._read_indicator_files(["AAA"], "inflation")
+    assert len(frames) == 1
+    assert frames[0].iso_code.tolist() == ["AAA"]
+
+    # saving a country file invalidates the combined file
+    wfp._save_file(frames[0], "AAA", "inflation")
+    assert not (tmp_path / "inflation.parquet").exists()
@@ -1,5 +1,9 @@
 """Tests for WHO module"""
 
+import io
+from contextlib import nullcontext
+from unittest.mock import patch
+
 import pandas as pd
 from numpy import nan
 
@@ -179,3 +183,68 @@ def test_clean_ghed_metadata():
     result = who._clean_metadata(raw)
 
     pd.testing.assert_frame_equal(result, expected)
+
+
+def test_download_ghed(tmp_path, monkeypatch):
+    """Test download_ghed() with a small workbook"""
+
+    monkeypatch.setattr(config.BBPaths, "raw_data", tmp_path)
+
+    sheets = {
+        "Data": pd.DataFrame(
+            {
+                "country": ["Algeria", "Algeria"],
+                "code": ["DZA", "DZA"],
+                "region": ["AFR", "AFR"],
+                "income": ["Low-Mid", "Low-Mid"],
+                "year": [2000, 2001],
+                "che_gdp": [3.5, 3.8],
+            }
+        ),
+        "Codebook": pd.DataFrame(
+            {
+                "Indicator short code": ["che_gdp", "unused"],
+                "Indicator name": ["CHE as % GDP", "Not in data"],
+                "Indicator currency": ["-", "-"],
+            }
+        ),
+        "Metadata": pd.DataFrame(
+            {
+                "country": ["Algeria"],
+                "code": ["DZA"],
+                "Indicator short code": ["che_gdp"],
+                "Sources": ["WHO"],
+            }
+        ),
+    }
+
+    content = io.BytesIO()
+    with pd.ExcelWriter(content) as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+
+    with patch.object(who, "extract_ghed_data", return_value=content.getvalue()):
+        who.download_ghed()
+
+    data = pd.read_parquet(tmp_path / "ghed_data.parquet")
+    assert data.value.tolist() == [3.5, 3.8]
+    assert data.indicator_name.unique().tolist() == ["CHE as % GDP"]
+    assert data.indicator_code.dtype == object
+    assert data.indicator_name.dtype == object
+
+    metadata = pd.read_parquet(tmp_path / "ghed_metadata.parquet")
+    assert metadata.columns.tolist() == ["country_code", "indicator_code", "source"]
+
+
+def test_extract_ghed_data(tmp_path, monkeypatch):
+    """Test extract_ghed_data() returns the bytes of the saved file"""
+
+    monkeypatch.setattr(config.BBPaths, "raw_data", tmp_path)
+    (tmp_path / "ghed.xlsx").write_bytes(b"ghed")
+
+    with patch.object(
+        who, "conditional_download", return_value=nullcontext(tmp_path / "ghed.xlsx")
+    ) as mock_download:
+        assert who.extract_ghed_data() == b"ghed"
+
+    mock_download.assert_called_once_with(who.GHED_URL, tmp_path / "ghed.xlsx")
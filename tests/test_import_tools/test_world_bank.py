@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pandas as pd
 import pytest
 from numpy import nan
@@ -92,6 +94,53 @@ def test__world_bank_data_get_data():
     assert df.indicator_code.nunique() == 2
 
 
+def test_world_bank_data_update_data(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.BBPaths, "raw_data", tmp_path)
+
+    def _mock_wb_data(indicator: str, **kwargs) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "date": pd.to_datetime(["2020-01-01"]),
+                "iso_code": ["FRA"],
+                "indicator_code": [indicator],
+                "value": [1.0],
+            }
+        )
+
+    with patch.object(world_bank, "_get_wb_data", side_effect=_mock_wb_data) as mock:
+        wb_obj = WorldBankData().load_data(indicator=["A", "B"])
+        assert mock.call_count == 2
+        assert wb_obj.get_data().indicator_code.sort_values().tolist() == ["A", "B"]
+
+        # indicators can be updated more than once
+        wb_obj.update_data(reload_data=False)
+        wb_obj.update_data(reload_data=True)
+        assert mock.call_count == 6
+
+    # data saved on disk is read when the indicator is loaded again
+    assert WorldBankData().load_data("A").get_data().value.tolist() == [1.0]
+
+    assert (tmp_path / "A_all_.parquet").exists()
+
+
+def test_pink_sheet_convert_legacy_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.BBPaths, "raw_data", tmp_path)
+
+    pd.DataFrame(
+        {"period": ["2020-01-01"], "indicator": ["Gold"], "value": [1.0]}
+    ).to_csv(tmp_path / "pink_sheet_prices.csv", index=False)
+
+    with patch.object(world_bank, "read_pink_sheet") as mock:
+        df = world_bank.PinkSheet().load_data("prices").get_data()
+        mock.assert_not_called()
+
+    assert pd.api.types.is_datetime64_any_dtype(df.period)
+
+    # the data is saved as parquet, leaving the legacy CSV in place
+    assert (tmp_path / "pink_sheet_prices.csv").exists()
+    assert (tmp_path / "pink_sheet_prices.parquet").exists()
+
+
 def test_clean_prices():
     """Test clean_prices"""
 